@@ -3,12 +3,19 @@ Pokedex API - Flask Application
 """
 
 import os
-from flask import Flask, jsonify, redirect
+from flask import Flask, Response, jsonify, redirect
 from flask_cors import CORS
 from helpers import (
     get_cached_data,
+    get_snapshot_derived,
+    find_pokemon,
+    find_pokemon_variants,
     extract_unique_types,
     parse_query_params,
+    parse_response_format,
+    parse_fields,
+    parse_similar_params,
+    parse_batch_queries,
     filter_by_type,
     filter_by_search,
     sort_pokemon,
@@ -16,6 +23,16 @@ from helpers import (
     add_captured_status,
     set_pokemon_captured,
     get_all_captured,
+    make_pokemon_key_from_params,
+    build_type_index,
+    execute_queries,
+    build_stat_index,
+    find_similar_pokemon,
+    to_columnar,
+    encode_json,
+    encode_records,
+    encode_page,
+    SELECTABLE_FIELDS,
 )
 
 app = Flask(__name__)
@@ -25,31 +42,90 @@ CORS(app)
 @app.route('/api/pokemon', methods=['GET'])
 def get_pokemon():
     params = parse_query_params()
-    data = get_cached_data()
+    snapshot = get_cached_data()
     
-    data = filter_by_type(data, params['type_filter'])
+    data = filter_by_type(snapshot, params['type_filter'])
     data = filter_by_search(data, params['search_term'])
     data = sort_pokemon(data, params['sort_order'])
     data, pagination = paginate(data, params['page'], params['limit'])
-    data = add_captured_status(data)
+    fields = params['fields']
+    
+    if params['format'] == 'columnar':
+        columnar = to_columnar(add_captured_status(data), fields or SELECTABLE_FIELDS)
+        payload = {'data': columnar, 'pagination': pagination}
+        return Response(encode_json(payload), mimetype='application/json')
     
+    if fields:
+        fragment_cache = get_snapshot_derived(snapshot, 'fragments', lambda _: {})
+        body = encode_page(encode_records(data, fields, fragment_cache), pagination)
+        return Response(body, mimetype='application/json')
+    
+    data = add_captured_status(data)
     return jsonify({'data': data, 'pagination': pagination})
 
 
+@app.route('/api/pokemon/query', methods=['POST'])
+def query_pokemon_batch():
+    try:
+        queries = parse_batch_queries()
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    data = get_cached_data()
+    type_index = get_snapshot_derived(data, 'types', build_type_index)
+    fragment_cache = get_snapshot_derived(data, 'fragments', lambda _: {})
+    
+    return Response(execute_queries(data, type_index, queries, fragment_cache), mimetype='application/json')
+
+
 @app.route('/api/pokemon/types', methods=['GET'])
 def get_pokemon_types():
     types = extract_unique_types(get_cached_data())
     return jsonify({'types': types})
 
 
+@app.route('/api/pokemon/<int:number>', methods=['GET'])
+def get_pokemon_by_number(number: int):
+    variants = find_pokemon_variants(number)
+    if not variants:
+        return jsonify({'error': 'Pokemon not found', 'number': number}), 404
+    return jsonify({'data': add_captured_status(variants)})
+
+
+@app.route('/api/pokemon/<int:number>/<name>', methods=['GET'])
+def get_pokemon_by_key(number: int, name: str):
+    pokemon = find_pokemon(number, name)
+    if pokemon is None:
+        return jsonify({'error': 'Pokemon not found', 'key': make_pokemon_key_from_params(number, name)}), 404
+    return jsonify({'data': add_captured_status([pokemon])[0]})
+
+
+@app.route('/api/pokemon/<int:number>/<name>/similar', methods=['GET'])
+def get_similar_pokemon(number: int, name: str):
+    params = parse_similar_params()
+    key = make_pokemon_key_from_params(number, name)
+    data = get_cached_data()
+    stat_index = get_snapshot_derived(data, 'stats', build_stat_index)
+    
+    similar = find_similar_pokemon(data, stat_index, key, params['k'], params['type_filter'])
+    if similar is None:
+        return jsonify({'error': 'Pokemon not found', 'key': key}), 404
+    
+    return jsonify({'key': key, 'data': add_captured_status(similar)})
+
+
 @app.route('/api/pokemon/<int:number>/<name>/capture', methods=['POST'])
 def capture_pokemon(number: int, name: str):
+    if find_pokemon(number, name) is None:
+        return jsonify({'error': 'Pokemon not found', 'key': make_pokemon_key_from_params(number, name)}), 404
     key = set_pokemon_captured(number, name, captured=True)
     return jsonify({'success': True, 'captured': True, 'key': key})
 
 
 @app.route('/api/pokemon/<int:number>/<name>/capture', methods=['DELETE'])
 def release_pokemon(number: int, name: str):
+    if find_pokemon(number, name) is None:
+        return jsonify({'error': 'Pokemon not found', 'key': make_pokemon_key_from_params(number, name)}), 404
     key = set_pokemon_captured(number, name, captured=False)
     return jsonify({'success': True, 'captured': False, 'key': key})
 
@@ -66,7 +142,23 @@ def get_icon(number: int):
 
 @app.route('/')
 def index():
-    return jsonify(get_cached_data())
+    data = get_cached_data()
+    fields = parse_fields()
+    if fields is not None:
+        # No captured status here, so fields=captured selects no fields at all
+        fields = tuple(field for field in fields if field != 'captured')
+    
+    if parse_response_format() == 'columnar':
+        if fields is not None:
+            return Response(encode_json(to_columnar(data, fields)), mimetype='application/json')
+        body = get_snapshot_derived(data, 'columnar', lambda data: encode_json(to_columnar(data)))
+        return Response(body, mimetype='application/json')
+    
+    if fields is not None:
+        fragment_cache = get_snapshot_derived(data, 'fragments', lambda _: {})
+        return Response(encode_records(data, fields, fragment_cache), mimetype='application/json')
+    
+    return jsonify(data)
 
 
 if __name__ == '__main__':
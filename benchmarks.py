@@ -0,0 +1,178 @@
+"""
+Micro-benchmarks for the Pokedex API hot paths.
+Run with: python3 benchmarks.py [benchmark ...] [--rows N]
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Callable, Dict, List, Any
+
+import db
+from app import app
+from flask import jsonify
+from helpers import (
+    add_captured_status,
+    build_type_index,
+    execute_queries,
+    filter_by_type,
+    filter_by_search,
+    sort_pokemon,
+    paginate,
+    parse_query_spec,
+    build_stat_index,
+    find_similar_pokemon,
+    make_pokemon_key,
+    to_columnar,
+    encode_json,
+    encode_records,
+    SELECTABLE_FIELDS,
+)
+
+# =============================================================================
+# Utilities
+# =============================================================================
+
+def load_dataset() -> List[Dict[str, Any]]:
+    """Load the real dataset straight from disk (skipping the simulated DB delay)."""
+    with open(db.DB_PATH, "rb") as f:
+        return json.loads(f.read())
+
+
+def make_synthetic_catalog(rows: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Build a catalog of `rows` Pokemon by resampling the real dataset with fresh names."""
+    rng = random.Random(seed)
+    source = load_dataset()
+    catalog = []
+    for i in range(rows):
+        pokemon = dict(rng.choice(source))
+        pokemon['number'] = i + 1
+        pokemon['name'] = f"{pokemon['name']}{i}"
+        catalog.append(pokemon)
+    return catalog
+
+
+def best_of(fn: Callable[[], Any], repeat: int = 5) -> float:
+    """Return the best wall-clock time of `repeat` runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+def bench_serialization(rows: int) -> None:
+    """Compare payload size and encode time of jsonify rows vs format=columnar."""
+    datasets = [('pokemon_db.json', load_dataset())]
+    if rows:
+        datasets.append((f'synthetic x{rows}', make_synthetic_catalog(rows)))
+
+    print(f"{'dataset':<20} {'format':<10} {'bytes':>12} {'encode ms':>10}")
+    for label, data in datasets:
+        data = add_captured_status(data)
+        fields = SELECTABLE_FIELDS
+        with app.test_request_context():
+            rows_bytes = jsonify(data).get_data()
+            rows_ms = best_of(lambda: jsonify(data).get_data())
+        columnar_bytes = encode_json(to_columnar(data, fields))
+        columnar_ms = best_of(lambda: encode_json(to_columnar(data, fields)))
+
+        print(f"{label:<20} {'json':<10} {len(rows_bytes):>12,} {rows_ms:>10.2f}")
+        print(f"{label:<20} {'columnar':<10} {len(columnar_bytes):>12,} {columnar_ms:>10.2f}")
+        print(f"{'':<20} {'ratio':<10} {len(columnar_bytes) / len(rows_bytes):>12.2f} "
+              f"{columnar_ms / rows_ms:>10.2f}")
+
+
+def bench_similar(rows: int) -> None:
+    """Time index build and per-query latency of find_similar_pokemon."""
+    datasets = [('pokemon_db.json', load_dataset())]
+    if rows:
+        datasets.append((f'synthetic x{rows}', make_synthetic_catalog(rows)))
+
+    print(f"{'dataset':<20} {'query':<16} {'ms':>10}")
+    for label, data in datasets:
+        build_ms = best_of(lambda: build_stat_index(data), repeat=1)
+        stat_index = build_stat_index(data)
+        key = make_pokemon_key(data[len(data) // 2])
+        print(f"{label:<20} {'build index':<16} {build_ms:>10.2f}")
+        for type_filter in ('', 'Dragon'):
+            ms = best_of(lambda: find_similar_pokemon(data, stat_index, key, 10, type_filter))
+            print(f"{label:<20} {'k=10 ' + (type_filter or 'all'):<16} {ms:>10.2f}")
+
+
+def bench_batch(rows: int) -> None:
+    """Compare a dashboard's queries run one by one vs in one execute_queries pass."""
+    datasets = [('pokemon_db.json', load_dataset())]
+    if rows:
+        datasets.append((f'synthetic x{rows}', make_synthetic_catalog(rows)))
+    specs = [{'type': t, 'page': page, 'limit': 20}
+             for t in ('Fire', 'Water', 'Grass', 'Dragon') for page in (1, 2, 3)]
+    queries = [parse_query_spec(spec) for spec in specs]
+
+    def run_separately(data):
+        for params in queries:
+            page = filter_by_type(data, params['type_filter'])
+            page = filter_by_search(page, params['search_term'])
+            page = sort_pokemon(page, params['sort_order'])
+            page, pagination = paginate(page, params['page'], params['limit'])
+            encode_json({'data': add_captured_status(page), 'pagination': pagination})
+
+    print(f"{'dataset':<20} {'mode':<16} {'ms':>10}  ({len(queries)} queries)")
+    for label, data in datasets:
+        type_index = build_type_index(data)
+        separate_ms = best_of(lambda: run_separately(data))
+        batch_ms = best_of(lambda: execute_queries(data, type_index, queries, {}))
+        print(f"{label:<20} {'separate':<16} {separate_ms:>10.2f}")
+        print(f"{label:<20} {'batch':<16} {batch_ms:>10.2f}")
+
+
+def bench_fields(rows: int) -> None:
+    """Compare jsonify of full rows vs fields= projections joined from cached fragments."""
+    datasets = [('pokemon_db.json', load_dataset())]
+    if rows:
+        datasets.append((f'synthetic x{rows}', make_synthetic_catalog(rows)))
+    grid_fields = ('number', 'name', 'type_one', 'type_two', 'captured')
+
+    print(f"{'dataset':<20} {'mode':<16} {'bytes':>12} {'encode ms':>10}")
+    for label, data in datasets:
+        with app.test_request_context():
+            full_bytes = jsonify(add_captured_status(data)).get_data()
+            full_ms = best_of(lambda: jsonify(add_captured_status(data)).get_data())
+        cold_ms = best_of(lambda: encode_records(data, grid_fields, {}))
+        fragment_cache = {}
+        grid_bytes = encode_records(data, grid_fields, fragment_cache)
+        warm_ms = best_of(lambda: encode_records(data, grid_fields, fragment_cache))
+
+        print(f"{label:<20} {'json':<16} {len(full_bytes):>12,} {full_ms:>10.2f}")
+        print(f"{label:<20} {'fields (cold)':<16} {len(grid_bytes):>12,} {cold_ms:>10.2f}")
+        print(f"{label:<20} {'fields (cached)':<16} {len(grid_bytes):>12,} {warm_ms:>10.2f}")
+
+
+BENCHMARKS = {
+    'serialization': bench_serialization,
+    'similar': bench_similar,
+    'batch': bench_batch,
+    'fields': bench_fields,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmarks', nargs='*',
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--rows', type=int, default=100_000,
+                        help='size of the synthetic catalog (0 to skip)')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"\n== {name} ==")
+        BENCHMARKS[name](args.rows)
@@ -4,19 +4,49 @@ Contains all business logic separated from Flask routes.
 """
 
 import db
+import json
 import time
-from typing import Set, List, Dict, Any
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import Set, List, Dict, Any, Callable, Optional, Sequence, FrozenSet, Tuple
 from difflib import SequenceMatcher
 from flask import request
+from werkzeug.datastructures import MultiDict
 
 CACHE_TTL = 60  # seconds
 VALID_PAGE_SIZES = [5, 10, 20]
 DEFAULT_PAGE_SIZE = 10
+VALID_FORMATS = ['json', 'columnar']
+DEFAULT_FORMAT = 'json'
+
+POKEMON_FIELDS = (
+    'number', 'name', 'type_one', 'type_two', 'total',
+    'hit_points', 'attack', 'defense', 'special_attack', 'special_defense',
+    'speed', 'generation', 'legendary',
+)
+TYPE_FIELDS = ('type_one', 'type_two')
+SELECTABLE_FIELDS = POKEMON_FIELDS + ('captured',)
+MAX_CACHED_FIELD_GROUPS = 8  # Distinct fields= selections whose fragments are cached per snapshot
+STAT_FIELDS = (
+    'hit_points', 'attack', 'defense', 'special_attack', 'special_defense', 'speed',
+)
+MAX_BATCH_QUERIES = 20
+QUERY_SPEC_TYPES = {  # Batch query spec key -> (accepted JSON types, description for errors)
+    'page': (int, 'an integer'),
+    'limit': (int, 'an integer'),
+    'sort': (str, 'a string'),
+    'type': (str, 'a string'),
+    'search': (str, 'a string'),
+    'format': (str, 'a string'),
+    'fields': ((str, list), 'a string or an array of strings'),
+}
+DEFAULT_SIMILAR_COUNT = 5
+MAX_SIMILAR_COUNT = 50
 
 # =============================================================================
 # In-Memory State
 # =============================================================================
-_cache: Dict[str, Any] = {"data": None, "timestamp": 0}
+_cache: Dict[str, Any] = {"snapshot": None, "timestamp": 0}  # snapshot: (data, derived structures)
 captured_pokemon: Set[str] = set()  # Store as "number:name" to handle variants
 
 # =============================================================================
@@ -64,10 +94,56 @@ def fuzzy_match(search_term: str, target: str, threshold: float = 0.6) -> bool:
 def get_cached_data() -> List[Dict[str, Any]]:
     """Get Pokemon data with caching to avoid 2s delay on every request."""
     current_time = time.time()
-    if _cache["data"] is None or (current_time - _cache["timestamp"]) > CACHE_TTL:
-        _cache["data"] = db.get()
+    if _cache["snapshot"] is None or (current_time - _cache["timestamp"]) > CACHE_TTL:
+        # Data and its derived structures are swapped in one assignment, so no
+        # request can pair the new data with structures built from the old one
+        _cache["snapshot"] = (db.get(), {})
         _cache["timestamp"] = current_time
-    return _cache["data"]
+    return _cache["snapshot"][0]
+
+
+def get_snapshot_derived(data: List[Dict], name: str, build: Callable[[List[Dict]], Any]) -> Any:
+    """
+    Get a structure derived from a data snapshot, building it on first use.
+    Derived structures are dropped whenever the cache reloads the data,
+    and are built without caching for data that is not the cached snapshot.
+    """
+    snapshot = _cache["snapshot"]
+    if snapshot is None or data is not snapshot[0]:
+        return build(data)
+    derived = snapshot[1]
+    if name not in derived:
+        derived[name] = build(data)
+    return derived[name]
+
+
+def build_pokemon_index(data: List[Dict]) -> Dict[str, Dict]:
+    """
+    Build hash indexes over one data snapshot:
+    'by_number' maps a number to all its variants (in data order),
+    'by_key' maps a "number:name" key to its Pokemon.
+    """
+    by_number: Dict[int, List[Dict]] = {}
+    by_key: Dict[str, Dict] = {}
+    for pokemon in data:
+        by_number.setdefault(pokemon.get('number'), []).append(pokemon)
+        by_key[make_pokemon_key(pokemon)] = pokemon
+    return {'by_number': by_number, 'by_key': by_key}
+
+
+def get_pokemon_index() -> Dict[str, Dict]:
+    """Get the hash indexes of the current data snapshot."""
+    return get_snapshot_derived(get_cached_data(), 'pokemon', build_pokemon_index)
+
+
+def find_pokemon(number: int, name: str) -> Optional[Dict]:
+    """Find a Pokemon by number and exact name in O(1). Returns None if it does not exist."""
+    return get_pokemon_index()['by_key'].get(make_pokemon_key_from_params(number, name))
+
+
+def find_pokemon_variants(number: int) -> List[Dict]:
+    """Find all Pokemon sharing a number (e.g. Venusaur and Mega Venusaur) in O(1)."""
+    return get_pokemon_index()['by_number'].get(number, [])
 
 
 def extract_unique_types(data: List[Dict]) -> List[str]:
@@ -86,13 +162,15 @@ def extract_unique_types(data: List[Dict]) -> List[str]:
 # Query Parameter Parsing
 # =============================================================================
 
-def parse_query_params() -> Dict[str, Any]:
-    """Parse and validate query parameters from the request."""
-    page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
-    sort_order = request.args.get('sort', 'asc', type=str)
-    type_filter = request.args.get('type', '', type=str)
-    search_term = request.args.get('search', '', type=str).lower()
+def parse_query_params(args: Optional[MultiDict] = None) -> Dict[str, Any]:
+    """Parse and validate query parameters from the request (or from `args` if given)."""
+    if args is None:
+        args = request.args
+    page = args.get('page', 1, type=int)
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    sort_order = args.get('sort', 'asc', type=str)
+    type_filter = args.get('type', '', type=str)
+    search_term = args.get('search', '', type=str).lower()
     
     # Validate limit - only allow specific values
     if limit not in VALID_PAGE_SIZES:
@@ -108,9 +186,87 @@ def parse_query_params() -> Dict[str, Any]:
         'sort_order': sort_order,
         'type_filter': type_filter,
         'search_term': search_term,
+        'format': parse_response_format(args),
+        'fields': parse_fields(args),
     }
 
 
+def parse_query_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parse and validate one query spec from a batch request body.
+    Values take native JSON types (see QUERY_SPEC_TYPES); null and unknown keys are ignored.
+    Raises ValueError for a value of the wrong type.
+    """
+    args = MultiDict()
+    for name, value in spec.items():
+        if value is None or name not in QUERY_SPEC_TYPES:
+            continue
+        expected, description = QUERY_SPEC_TYPES[name]
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError(f"'{name}' must be {description}")
+        if isinstance(value, list):
+            if not all(isinstance(item, str) for item in value):
+                raise ValueError(f"'{name}' must be {description}")
+            value = ','.join(value)
+        args[name] = str(value)
+    return parse_query_params(args)
+
+
+def parse_similar_params() -> Dict[str, Any]:
+    """Parse and validate query parameters for the similar Pokemon endpoint."""
+    k = request.args.get('k', DEFAULT_SIMILAR_COUNT, type=int)
+    type_filter = request.args.get('type', '', type=str)
+    
+    # Validate k - must be positive and bounded
+    if k < 1:
+        k = DEFAULT_SIMILAR_COUNT
+    k = min(k, MAX_SIMILAR_COUNT)
+    
+    return {'k': k, 'type_filter': type_filter}
+
+
+def parse_batch_queries() -> List[Dict[str, Any]]:
+    """
+    Parse the JSON array of query specs from a batch request body.
+    Raises ValueError if the body is not an array of 1 to MAX_BATCH_QUERIES valid query objects.
+    """
+    specs = request.get_json(silent=True)
+    if not isinstance(specs, list) or not 0 < len(specs) <= MAX_BATCH_QUERIES:
+        raise ValueError(f'Expected a JSON array of 1 to {MAX_BATCH_QUERIES} query objects')
+    
+    queries = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            raise ValueError(f'Query {i}: expected a JSON object')
+        try:
+            queries.append(parse_query_spec(spec))
+        except ValueError as error:
+            raise ValueError(f'Query {i}: {error}') from error
+    return queries
+
+
+def parse_fields(args: Optional[MultiDict] = None) -> Optional[Tuple[str, ...]]:
+    """
+    Parse the comma-separated `fields` projection, ignoring unknown names.
+    Returns the selected fields in canonical order, or None if no valid field was given.
+    """
+    if args is None:
+        args = request.args
+    requested = {name.strip() for name in args.get('fields', '', type=str).split(',')}
+    fields = tuple(field for field in SELECTABLE_FIELDS if field in requested)
+    return fields or None
+
+
+def parse_response_format(args: Optional[MultiDict] = None) -> str:
+    """Parse the response format, falling back to plain JSON for unknown values."""
+    if args is None:
+        args = request.args
+    response_format = args.get('format', DEFAULT_FORMAT, type=str).lower()
+    if response_format not in VALID_FORMATS:
+        response_format = DEFAULT_FORMAT
+    return response_format
+
+
 # =============================================================================
 # Filtering Functions
 # =============================================================================
@@ -128,6 +284,15 @@ def filter_by_type(data: List[Dict], type_filter: str) -> List[Dict]:
     ]
 
 
+def build_type_index(data: List[Dict]) -> Dict[str, List[Dict]]:
+    """Group Pokemon by lowercased type, keeping data order (same matches as filter_by_type)."""
+    index: Dict[str, List[Dict]] = {}
+    for pokemon in data:
+        for type_name in {pokemon.get(f, '').lower() for f in TYPE_FIELDS} - {''}:
+            index.setdefault(type_name, []).append(pokemon)
+    return index
+
+
 def filter_by_search(data: List[Dict], search_term: str) -> List[Dict]:
     """Filter Pokemon by fuzzy search across multiple fields."""
     if not search_term:
@@ -189,10 +354,15 @@ def paginate(data: List[Dict], page: int, limit: int) -> tuple[List[Dict], Dict]
 # Capture Status Functions
 # =============================================================================
 
-def add_captured_status(pokemon_list: List[Dict]) -> List[Dict]:
-    """Add captured status to each Pokemon based on in-memory storage."""
+def add_captured_status(pokemon_list: List[Dict], captured: Optional[FrozenSet[str]] = None) -> List[Dict]:
+    """
+    Add captured status to each Pokemon based on in-memory storage.
+    Pass `captured` to use a fixed set of keys instead (e.g. one snapshot per batch).
+    """
+    if captured is None:
+        captured = captured_pokemon
     return [
-        {**pokemon, 'captured': make_pokemon_key(pokemon) in captured_pokemon}
+        {**pokemon, 'captured': make_pokemon_key(pokemon) in captured}
         for pokemon in pokemon_list
     ]
 
@@ -210,3 +380,201 @@ def set_pokemon_captured(number: int, name: str, captured: bool) -> str:
 def get_all_captured() -> List[str]:
     """Get list of all captured Pokemon keys."""
     return list(captured_pokemon)
+
+
+# =============================================================================
+# Batch Query Functions
+# =============================================================================
+
+def execute_queries(
+    data: List[Dict],
+    type_index: Dict[str, List[Dict]],
+    queries: List[Dict[str, Any]],
+    fragment_cache: Dict[Tuple[str, ...], Dict[str, bytes]],
+) -> bytes:
+    """
+    Run several parsed queries against one data snapshot in a shared pass
+    and return the JSON array of their {data, pagination} results.
+    Type filters use `type_index`, queries that differ only in page/limit/format/fields
+    share one filtered and sorted list, the captured set is read once, and
+    fields= projections are joined from `fragment_cache` as in encode_records.
+    """
+    captured = frozenset(captured_pokemon)
+    matches: Dict[tuple, List[Dict]] = {}
+    results = []
+
+    for params in queries:
+        type_filter = params['type_filter'].lower()
+        match_key = (type_filter, params['search_term'], params['sort_order'] == 'desc')
+        if match_key not in matches:
+            rows = type_index.get(type_filter, []) if type_filter else data
+            rows = filter_by_search(rows, params['search_term'])
+            matches[match_key] = sort_pokemon(rows, params['sort_order'])
+
+        page, pagination = paginate(matches[match_key], params['page'], params['limit'])
+        if params['format'] == 'columnar':
+            columnar = to_columnar(add_captured_status(page, captured), params['fields'] or SELECTABLE_FIELDS)
+            results.append(encode_json({'data': columnar, 'pagination': pagination}))
+        elif params['fields']:
+            records = encode_records(page, params['fields'], fragment_cache, captured)
+            results.append(encode_page(records, pagination))
+        else:
+            results.append(encode_json({'data': add_captured_status(page, captured), 'pagination': pagination}))
+
+    return b'[' + b','.join(results) + b']'
+
+
+# =============================================================================
+# Similarity Functions
+# =============================================================================
+
+def build_stat_index(data: List[Dict]) -> Dict[str, Any]:
+    """
+    Build the structures used by find_similar_pokemon for one data snapshot:
+    a float32 matrix of min-max normalized stats (one row per Pokemon), a KD-tree
+    over it, row positions by key and, per type, its row positions and their KD-tree.
+    """
+    stats = np.array(
+        [[pokemon.get(f) or 0 for f in STAT_FIELDS] for pokemon in data],
+        dtype=np.float64,
+    ).reshape(len(data), len(STAT_FIELDS))
+    if len(data):
+        lows = stats.min(axis=0)
+        spans = stats.max(axis=0) - lows
+        spans[spans == 0] = 1
+        stats = (stats - lows) / spans
+    matrix = stats.astype(np.float32)
+
+    positions = {}
+    by_type: Dict[str, List[int]] = {}
+    for i, pokemon in enumerate(data):
+        positions[make_pokemon_key(pokemon)] = i
+        for type_name in {pokemon.get(f, '').lower() for f in TYPE_FIELDS} - {''}:
+            by_type.setdefault(type_name, []).append(i)
+
+    type_trees = {}
+    for type_name, rows in by_type.items():
+        rows = np.array(rows, dtype=np.intp)
+        type_trees[type_name] = (rows, cKDTree(matrix[rows]))
+
+    return {
+        'matrix': matrix,
+        'tree': cKDTree(matrix),
+        'positions': positions,
+        'by_type': type_trees,
+    }
+
+
+def find_similar_pokemon(
+    data: List[Dict], stat_index: Dict[str, Any], key: str, k: int, type_filter: str = ''
+) -> Optional[List[Dict]]:
+    """
+    Find the k Pokemon whose stats are closest (Euclidean distance) to the Pokemon with `key`.
+    Optionally restricted to a type. Returns None if `key` is not in the data.
+    Among Pokemon at exactly the same distance, which ones make the top k is unspecified.
+    """
+    position = stat_index['positions'].get(key)
+    if position is None:
+        return None
+
+    if type_filter:
+        if type_filter.lower() not in stat_index['by_type']:
+            return []
+        rows, tree = stat_index['by_type'][type_filter.lower()]
+    else:
+        rows, tree = None, stat_index['tree']
+    if k <= 0 or tree.n == 0:
+        return []
+
+    # One extra neighbour so the Pokemon itself can be dropped from the results
+    distances, nearest = tree.query(stat_index['matrix'][position], k=range(1, min(k + 1, tree.n) + 1))
+    if rows is not None:
+        nearest = rows[nearest]
+    others = nearest != position
+    nearest, distances = nearest[others][:k], distances[others][:k]
+
+    order = np.lexsort((nearest, distances))  # Nearest first, ties by data order
+    return [
+        {**data[nearest[i]], 'distance': round(float(distances[i]), 4)}
+        for i in order
+    ]
+
+
+# =============================================================================
+# Serialization Functions
+# =============================================================================
+
+def to_columnar(pokemon_list: List[Dict], fields: Sequence[str] = POKEMON_FIELDS) -> Dict[str, Any]:
+    """
+    Convert a list of Pokemon into a columnar layout.
+    Field names are listed once and each field becomes an array of values.
+    Type strings are dictionary-encoded as indexes into the 'types' list.
+    """
+    types = sorted({
+        pokemon.get(field, '')
+        for pokemon in pokemon_list
+        for field in TYPE_FIELDS
+        if field in fields
+    })
+    type_index = {type_name: i for i, type_name in enumerate(types)}
+
+    columns = []
+    for field in fields:
+        if field in TYPE_FIELDS:
+            columns.append([type_index[pokemon.get(field, '')] for pokemon in pokemon_list])
+        else:
+            columns.append([pokemon.get(field) for pokemon in pokemon_list])
+
+    return {'fields': list(fields), 'types': types, 'columns': columns}
+
+
+def encode_json(payload: Any) -> bytes:
+    """Encode a payload as compact UTF-8 JSON."""
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def encode_page(records: bytes, pagination: Dict) -> bytes:
+    """Assemble a {data, pagination} JSON object around an already-encoded records array."""
+    return b'{"data":' + records + b',"pagination":' + encode_json(pagination) + b'}'
+
+
+def encode_fragment(pokemon: Dict, fields: Sequence[str]) -> bytes:
+    """Encode the selected fields of a Pokemon as a JSON object missing its closing brace."""
+    return encode_json({field: pokemon.get(field) for field in fields})[:-1]
+
+
+def encode_records(
+    pokemon_list: List[Dict],
+    fields: Sequence[str],
+    fragment_cache: Dict[Tuple[str, ...], Dict[str, bytes]],
+    captured: Optional[FrozenSet[str]] = None,
+) -> bytes:
+    """
+    Encode Pokemon as a JSON array containing only `fields`, by joining per-record fragments.
+    Fragments are reused from `fragment_cache` (keyed by field group, then Pokemon key)
+    and added to it on first use. A 'captured' field is appended to each fragment
+    from the captured set, so captures never invalidate cached fragments.
+    """
+    record_fields = tuple(field for field in fields if field != 'captured')
+    if record_fields in fragment_cache or len(fragment_cache) < MAX_CACHED_FIELD_GROUPS:
+        fragments = fragment_cache.setdefault(record_fields, {})
+    else:
+        fragments = {}  # Too many distinct selections: encode without caching
+
+    with_captured = 'captured' in fields
+    if with_captured and captured is None:
+        captured = captured_pokemon
+    separator = b',' if record_fields else b''
+
+    records = []
+    for pokemon in pokemon_list:
+        key = make_pokemon_key(pokemon)
+        fragment = fragments.get(key)
+        if fragment is None:
+            fragment = fragments[key] = encode_fragment(pokemon, record_fields)
+        if with_captured:
+            fragment += separator + (b'"captured":true}' if key in captured else b'"captured":false}')
+        else:
+            fragment += b'}'
+        records.append(fragment)
+    return b'[' + b','.join(records) + b']'
@@ -95,6 +95,150 @@ class TestGetPokemon:
         assert 'captured' in data['data'][0]
 
 
+# =============================================================================
+# Test: format=columnar
+# =============================================================================
+
+class TestColumnarFormat:
+    def test_pokemon_list_columnar(self, client):
+        rows = json.loads(client.get('/api/pokemon?limit=5').data)
+        response = client.get('/api/pokemon?limit=5&format=columnar')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['pagination'] == rows['pagination']
+        columnar = data['data']
+        assert columnar['fields'][-1] == 'captured'
+        names = columnar['columns'][columnar['fields'].index('name')]
+        assert names == [p['name'] for p in rows['data']]
+    
+    def test_columnar_decodes_to_rows(self, client):
+        rows = json.loads(client.get('/api/pokemon?type=Fire&limit=20').data)['data']
+        data = json.loads(client.get('/api/pokemon?type=Fire&limit=20&format=columnar').data)['data']
+        decoded = []
+        for i in range(len(rows)):
+            record = {}
+            for field, column in zip(data['fields'], data['columns']):
+                value = column[i]
+                record[field] = data['types'][value] if field in ('type_one', 'type_two') else value
+            decoded.append(record)
+        assert decoded == rows
+    
+    def test_index_columnar(self, client):
+        rows = json.loads(client.get('/').data)
+        response = client.get('/?format=columnar')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['columns'][0]) == len(rows)
+        assert len(response.data) < len(client.get('/').data)
+    
+    def test_unknown_format_uses_json(self, client):
+        response = client.get('/api/pokemon?format=xml')
+        data = json.loads(response.data)
+        assert isinstance(data['data'], list)
+
+
+# =============================================================================
+# Test: fields= projection
+# =============================================================================
+
+class TestSparseFields:
+    GRID_FIELDS = ['number', 'name', 'type_one', 'type_two', 'captured']
+    
+    def test_pokemon_list_fields(self, client):
+        full = json.loads(client.get('/api/pokemon?type=Fire&limit=20').data)
+        response = client.get('/api/pokemon?type=Fire&limit=20&fields=' + ','.join(self.GRID_FIELDS))
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['pagination'] == full['pagination']
+        assert data['data'] == [{f: p[f] for f in self.GRID_FIELDS} for p in full['data']]
+    
+    def test_fields_reflect_captures(self, client):
+        client.get('/api/pokemon?search=pikachu&fields=name,captured')
+        client.post('/api/pokemon/25/Pikachu/capture')
+        data = json.loads(client.get('/api/pokemon?search=pikachu&fields=name,captured').data)
+        pikachu = next(p for p in data['data'] if p['name'] == 'Pikachu')
+        assert pikachu['captured'] is True
+    
+    def test_index_fields(self, client):
+        full = json.loads(client.get('/').data)
+        response = client.get('/?fields=number,name,captured')
+        data = json.loads(response.data)
+        assert data == [{'number': p['number'], 'name': p['name']} for p in full]
+    
+    def test_index_only_captured_returns_empty_objects(self, client):
+        full = json.loads(client.get('/').data)
+        data = json.loads(client.get('/?fields=captured').data)
+        assert data == [{}] * len(full)
+    
+    def test_columnar_fields(self, client):
+        response = client.get('/api/pokemon?format=columnar&fields=name,captured')
+        data = json.loads(response.data)
+        assert data['data']['fields'] == ['name', 'captured']
+    
+    def test_batch_fields(self, client):
+        response = client.post('/api/pokemon/query', json=[{'fields': 'name,captured', 'limit': 5}])
+        [result] = json.loads(response.data)
+        assert all(set(p) == {'name', 'captured'} for p in result['data'])
+    
+    def test_unknown_fields_return_full_records(self, client):
+        data = json.loads(client.get('/api/pokemon?fields=color').data)
+        assert 'attack' in data['data'][0]
+
+
+# =============================================================================
+# Test: POST /api/pokemon/query
+# =============================================================================
+
+class TestBatchQuery:
+    def test_results_match_single_queries(self, client):
+        specs = [
+            {'type': 'Fire', 'limit': 5},
+            {'type': 'Water', 'page': 2, 'limit': 20},
+            {'search': 'pikacu', 'sort': 'desc'},
+        ]
+        response = client.post('/api/pokemon/query', json=specs)
+        assert response.status_code == 200
+        results = json.loads(response.data)
+        assert len(results) == len(specs)
+        
+        urls = [
+            '/api/pokemon?type=Fire&limit=5',
+            '/api/pokemon?type=Water&page=2&limit=20',
+            '/api/pokemon?search=pikacu&sort=desc',
+        ]
+        for result, url in zip(results, urls):
+            assert result == json.loads(client.get(url).data)
+    
+    def test_rejects_non_array(self, client):
+        response = client.post('/api/pokemon/query', json={'type': 'Fire'})
+        assert response.status_code == 400
+    
+    def test_rejects_empty_array(self, client):
+        response = client.post('/api/pokemon/query', json=[])
+        assert response.status_code == 400
+    
+    def test_rejects_too_many_queries(self, client):
+        response = client.post('/api/pokemon/query', json=[{}] * 21)
+        assert response.status_code == 400
+    
+    def test_rejects_non_object_specs(self, client):
+        response = client.post('/api/pokemon/query', json=['Fire'])
+        assert response.status_code == 400
+    
+    def test_fields_as_array(self, client):
+        response = client.post('/api/pokemon/query', json=[{'fields': ['name', 'number'], 'limit': 5}])
+        [result] = json.loads(response.data)
+        assert all(set(p) == {'name', 'number'} for p in result['data'])
+    
+    @pytest.mark.parametrize('spec', [{'limit': 5.0}, {'page': True}, {'fields': [1]}])
+    def test_rejects_wrong_value_types(self, client, spec):
+        response = client.post('/api/pokemon/query', json=[{}, spec])
+        assert response.status_code == 400
+        error = json.loads(response.data)['error']
+        assert error.startswith('Query 1:')
+        assert next(iter(spec)) in error
+
+
 # =============================================================================
 # Test: GET /api/pokemon/types
 # =============================================================================
@@ -120,6 +264,65 @@ class TestGetPokemonTypes:
         assert 'Grass' in data['types']
 
 
+# =============================================================================
+# Test: GET /api/pokemon/<number> and /api/pokemon/<number>/<name>
+# =============================================================================
+
+class TestGetSinglePokemon:
+    def test_number_returns_all_variants(self, client):
+        response = client.get('/api/pokemon/3')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [p['name'] for p in data['data']] == ['Venusaur', 'VenusaurMega Venusaur']
+        assert all('captured' in p for p in data['data'])
+    
+    def test_unknown_number_returns_404(self, client):
+        response = client.get('/api/pokemon/99999')
+        assert response.status_code == 404
+    
+    def test_key_returns_pokemon(self, client):
+        client.post('/api/pokemon/25/Pikachu/capture')
+        response = client.get('/api/pokemon/25/Pikachu')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['data']['name'] == 'Pikachu'
+        assert data['data']['captured'] is True
+    
+    def test_unknown_key_returns_404(self, client):
+        response = client.get('/api/pokemon/25/Raichu')
+        assert response.status_code == 404
+
+
+# =============================================================================
+# Test: GET /api/pokemon/<number>/<name>/similar
+# =============================================================================
+
+class TestSimilarPokemon:
+    def test_returns_similar_list(self, client):
+        response = client.get('/api/pokemon/25/Pikachu/similar')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['key'] == '25:Pikachu'
+        assert len(data['data']) == 5
+        assert all('distance' in p and 'captured' in p for p in data['data'])
+    
+    def test_custom_k(self, client):
+        response = client.get('/api/pokemon/25/Pikachu/similar?k=3')
+        data = json.loads(response.data)
+        assert len(data['data']) == 3
+    
+    def test_type_filter(self, client):
+        response = client.get('/api/pokemon/25/Pikachu/similar?type=Water&k=10')
+        data = json.loads(response.data)
+        assert len(data['data']) == 10
+        for pokemon in data['data']:
+            assert pokemon['type_one'] == 'Water' or pokemon.get('type_two') == 'Water'
+    
+    def test_unknown_pokemon_returns_404(self, client):
+        response = client.get('/api/pokemon/25/Missingno/similar')
+        assert response.status_code == 404
+
+
 # =============================================================================
 # Test: POST /api/pokemon/<number>/<name>/capture
 # =============================================================================
@@ -139,6 +342,12 @@ class TestCapturePokemon:
         data = json.loads(response.data)
         assert '25:Pikachu' in data['captured']
     
+    def test_unknown_pokemon_returns_404(self, client):
+        response = client.post('/api/pokemon/25/Missingno/capture')
+        assert response.status_code == 404
+        response = client.get('/api/captured')
+        assert json.loads(response.data)['captured'] == []
+    
     def test_captured_shows_in_pokemon_list(self, client):
         client.post('/api/pokemon/1/Bulbasaur/capture')
         response = client.get('/api/pokemon?search=bulbasaur')
@@ -161,6 +370,10 @@ class TestReleasePokemon:
         assert data['success'] is True
         assert data['captured'] is False
     
+    def test_unknown_pokemon_returns_404(self, client):
+        response = client.delete('/api/pokemon/25/Missingno/capture')
+        assert response.status_code == 404
+    
     def test_released_pokemon_removed_from_list(self, client):
         client.post('/api/pokemon/25/Pikachu/capture')
         client.delete('/api/pokemon/25/Pikachu/capture')
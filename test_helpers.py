@@ -4,11 +4,17 @@ Run with: pytest test_helpers.py -v
 """
 
 import pytest
+import json
+import random
+import helpers
+from werkzeug.datastructures import MultiDict
 from helpers import (
     make_pokemon_key,
     make_pokemon_key_from_params,
     fuzzy_match,
     extract_unique_types,
+    build_pokemon_index,
+    get_snapshot_derived,
     filter_by_type,
     filter_by_search,
     sort_pokemon,
@@ -17,6 +23,17 @@ from helpers import (
     set_pokemon_captured,
     get_all_captured,
     captured_pokemon,
+    parse_query_spec,
+    build_type_index,
+    execute_queries,
+    build_stat_index,
+    find_similar_pokemon,
+    to_columnar,
+    encode_json,
+    encode_records,
+    parse_fields,
+    POKEMON_FIELDS,
+    STAT_FIELDS,
 )
 
 
@@ -109,6 +126,56 @@ class TestExtractUniqueTypes:
         assert extract_unique_types([]) == []
 
 
+# =============================================================================
+# Test: Snapshot Derived Structures
+# =============================================================================
+
+class TestSnapshotDerived:
+    def test_built_once_per_snapshot(self, monkeypatch):
+        monkeypatch.setitem(helpers._cache, "snapshot", (SAMPLE_POKEMON, {}))
+        builds = []
+        build = lambda data: builds.append(data) or len(data)
+        assert get_snapshot_derived(SAMPLE_POKEMON, "count", build) == 5
+        assert get_snapshot_derived(SAMPLE_POKEMON, "count", build) == 5
+        assert len(builds) == 1
+    
+    def test_new_snapshot_gets_new_structures(self, monkeypatch):
+        monkeypatch.setitem(helpers._cache, "snapshot", (SAMPLE_POKEMON, {}))
+        get_snapshot_derived(SAMPLE_POKEMON, "count", len)
+        new_data = SAMPLE_POKEMON[:2]
+        monkeypatch.setitem(helpers._cache, "snapshot", (new_data, {}))
+        assert get_snapshot_derived(new_data, "count", len) == 2
+    
+    def test_old_snapshot_is_not_cached_with_new_one(self, monkeypatch):
+        new_data = SAMPLE_POKEMON[:2]
+        monkeypatch.setitem(helpers._cache, "snapshot", (new_data, {}))
+        assert get_snapshot_derived(SAMPLE_POKEMON, "count", len) == 5
+        assert helpers._cache["snapshot"][1] == {}
+
+
+# =============================================================================
+# Test: Pokemon Index
+# =============================================================================
+
+class TestBuildPokemonIndex:
+    VARIANTS = SAMPLE_POKEMON + [
+        {"number": 6, "name": "CharizardMega Charizard X", "type_one": "Fire", "type_two": "Dragon", "generation": 1},
+    ]
+    
+    def test_by_key(self):
+        index = build_pokemon_index(self.VARIANTS)
+        assert index["by_key"]["25:Pikachu"] is SAMPLE_POKEMON[3]
+        assert "25:pikachu" not in index["by_key"]
+    
+    def test_by_number_groups_variants(self):
+        index = build_pokemon_index(self.VARIANTS)
+        assert [p["name"] for p in index["by_number"][6]] == ["Charizard", "CharizardMega Charizard X"]
+        assert len(index["by_number"][25]) == 1
+    
+    def test_empty_list(self):
+        assert build_pokemon_index([]) == {"by_number": {}, "by_key": {}}
+
+
 # =============================================================================
 # Test: Filter by Type
 # =============================================================================
@@ -274,3 +341,292 @@ class TestCaptureStatus:
         result = add_captured_status(SAMPLE_POKEMON)
         assert "captured" not in SAMPLE_POKEMON[0]
         assert "captured" in result[0]
+
+
+# =============================================================================
+# Test: Batch Queries
+# =============================================================================
+
+class TestParseQuerySpec:
+    def test_defaults(self):
+        params = parse_query_spec({})
+        assert params["page"] == 1
+        assert params["limit"] == 10
+        assert params["sort_order"] == "asc"
+        assert params["type_filter"] == ""
+        assert params["format"] == "json"
+    
+    def test_json_values(self):
+        params = parse_query_spec({"page": 2, "limit": 5, "type": "Fire", "search": "CHAR"})
+        assert params["page"] == 2
+        assert params["limit"] == 5
+        assert params["type_filter"] == "Fire"
+        assert params["search_term"] == "char"
+    
+    def test_invalid_values_use_defaults(self):
+        params = parse_query_spec({"page": 0, "limit": 7, "sort": None})
+        assert params["page"] == 1
+        assert params["limit"] == 10
+        assert params["sort_order"] == "asc"
+    
+    def test_fields_string_or_list(self):
+        assert parse_query_spec({"fields": "name,number"})["fields"] == ("number", "name")
+        assert parse_query_spec({"fields": ["name", "number"]})["fields"] == ("number", "name")
+    
+    def test_unknown_keys_ignored(self):
+        assert parse_query_spec({"color": 5}) == parse_query_spec({})
+    
+    @pytest.mark.parametrize("spec", [
+        {"limit": 5.0},
+        {"page": "2"},
+        {"page": True},
+        {"limit": [5]},
+        {"search": 25},
+        {"type": ["Fire"]},
+        {"fields": ["name", 1]},
+        {"fields": {"name": True}},
+    ])
+    def test_wrong_types_raise(self, spec):
+        with pytest.raises(ValueError, match=next(iter(spec))):
+            parse_query_spec(spec)
+
+
+class TestBuildTypeIndex:
+    def test_matches_filter_by_type(self):
+        index = build_type_index(SAMPLE_POKEMON)
+        for type_name in ["Fire", "Poison", "Water", "Flying"]:
+            assert index[type_name.lower()] == filter_by_type(SAMPLE_POKEMON, type_name)
+    
+    def test_no_empty_type(self):
+        assert "" not in build_type_index(SAMPLE_POKEMON)
+
+
+class TestExecuteQueries:
+    def setup_method(self):
+        captured_pokemon.clear()
+        self.index = build_type_index(SAMPLE_POKEMON)
+        self.fragments = {}
+    
+    def run(self, *specs):
+        queries = [parse_query_spec(spec) for spec in specs]
+        return json.loads(execute_queries(SAMPLE_POKEMON, self.index, queries, self.fragments))
+    
+    def test_one_result_per_query(self):
+        results = self.run({"type": "Fire"}, {"type": "Water"}, {})
+        assert [r["pagination"]["total_items"] for r in results] == [2, 1, 5]
+    
+    def test_matches_single_pipeline(self):
+        [result] = self.run({"type": "fire", "search": "char", "sort": "desc", "limit": 5})
+        expected = sort_pokemon(filter_by_search(filter_by_type(SAMPLE_POKEMON, "fire"), "char"), "desc")
+        assert [p["name"] for p in result["data"]] == [p["name"] for p in expected]
+    
+    def test_pages_share_filter(self):
+        first, second = self.run({"limit": 5, "page": 1}, {"limit": 5, "page": 2})
+        assert first["pagination"]["page"] == 1
+        assert second["pagination"]["page"] == 1  # Adjusted to last page
+    
+    def test_captured_status(self):
+        set_pokemon_captured(25, "Pikachu", captured=True)
+        [result] = self.run({"type": "Electric"})
+        assert result["data"][0]["captured"] is True
+    
+    def test_unknown_type_returns_empty(self):
+        [result] = self.run({"type": "Dragon"})
+        assert result["data"] == []
+    
+    def test_columnar_format(self):
+        [result] = self.run({"type": "Fire", "format": "columnar"})
+        assert result["data"]["fields"][-1] == "captured"
+    
+    def test_fields_use_fragment_cache(self):
+        set_pokemon_captured(4, "Charmander", captured=True)
+        [result] = self.run({"type": "Fire", "fields": "name,captured"})
+        assert result["data"] == [
+            {"name": "Charmander", "captured": True},
+            {"name": "Charizard", "captured": False},
+        ]
+        assert self.fragments[("name",)]["4:Charmander"] == b'{"name":"Charmander"'
+
+
+# =============================================================================
+# Test: Similar Pokemon
+# =============================================================================
+
+STAT_POKEMON = [
+    {"number": 1, "name": "Low", "type_one": "Grass", "type_two": "",
+     "hit_points": 10, "attack": 10, "defense": 10, "special_attack": 10, "special_defense": 10, "speed": 10},
+    {"number": 2, "name": "LowToo", "type_one": "Fire", "type_two": "",
+     "hit_points": 12, "attack": 11, "defense": 10, "special_attack": 10, "special_defense": 10, "speed": 10},
+    {"number": 3, "name": "Mid", "type_one": "Grass", "type_two": "Poison",
+     "hit_points": 50, "attack": 50, "defense": 50, "special_attack": 50, "special_defense": 50, "speed": 50},
+    {"number": 4, "name": "High", "type_one": "Water", "type_two": "",
+     "hit_points": 100, "attack": 100, "defense": 100, "special_attack": 100, "special_defense": 100, "speed": 100},
+]
+
+
+class TestFindSimilar:
+    def setup_method(self):
+        self.index = build_stat_index(STAT_POKEMON)
+    
+    def test_stats_are_normalized(self):
+        assert self.index["matrix"].dtype == "float32"
+        assert self.index["matrix"][0].tolist() == [0.0] * 6
+        assert self.index["matrix"][3].tolist() == [1.0] * 6
+    
+    def test_distances(self):
+        result = find_similar_pokemon(STAT_POKEMON, self.index, "1:Low", k=3)
+        assert result[-1]["distance"] == round(6 ** 0.5, 4)
+    
+    def test_nearest_first(self):
+        result = find_similar_pokemon(STAT_POKEMON, self.index, "1:Low", k=3)
+        assert [p["name"] for p in result] == ["LowToo", "Mid", "High"]
+        distances = [p["distance"] for p in result]
+        assert distances == sorted(distances)
+    
+    def test_excludes_self(self):
+        result = find_similar_pokemon(STAT_POKEMON, self.index, "3:Mid", k=10)
+        assert "Mid" not in [p["name"] for p in result]
+        assert len(result) == 3
+    
+    def test_limits_to_k(self):
+        result = find_similar_pokemon(STAT_POKEMON, self.index, "1:Low", k=1)
+        assert [p["name"] for p in result] == ["LowToo"]
+    
+    def test_type_filter(self):
+        result = find_similar_pokemon(STAT_POKEMON, self.index, "1:Low", k=3, type_filter="poison")
+        assert [p["name"] for p in result] == ["Mid"]
+    
+    def test_unknown_key(self):
+        assert find_similar_pokemon(STAT_POKEMON, self.index, "99:Missing", k=3) is None
+    
+    def test_unknown_type_returns_empty(self):
+        assert find_similar_pokemon(STAT_POKEMON, self.index, "1:Low", k=3, type_filter="dragon") == []
+    
+    def test_empty_index(self):
+        assert build_stat_index([])["matrix"].shape == (0, 6)
+    
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        data = [
+            {"number": i, "name": f"P{i}", "type_one": rng.choice(["Fire", "Water"]), "type_two": "",
+             **{f: rng.randint(1, 255) for f in STAT_FIELDS}}
+            for i in range(500)
+        ]
+        index = build_stat_index(data)
+        matrix = index["matrix"].astype("float64")
+        for position in (0, 123, 499):
+            for type_filter in ("", "water"):
+                result = find_similar_pokemon(data, index, f"{position}:P{position}", 10, type_filter)
+                expected = sorted(
+                    ((((matrix[i] - matrix[position]) ** 2).sum() ** 0.5, i)
+                     for i in range(len(data))
+                     if i != position and (not type_filter or data[i]["type_one"] == "Water")),
+                )[:10]
+                assert [p["number"] for p in result] == [i for _, i in expected]
+    
+    def test_duplicates_of_self(self):
+        data = [dict(STAT_POKEMON[0], name=f"Low{i}") for i in range(20)]
+        index = build_stat_index(data)
+        result = find_similar_pokemon(data, index, "1:Low3", k=5)
+        assert len(result) == 5
+        assert "Low3" not in [p["name"] for p in result]
+        assert all(p["distance"] == 0 for p in result)
+    
+    def test_does_not_modify_original(self):
+        find_similar_pokemon(STAT_POKEMON, self.index, "1:Low", k=3)
+        assert "distance" not in STAT_POKEMON[1]
+
+
+# =============================================================================
+# Test: Columnar Serialization
+# =============================================================================
+
+class TestToColumnar:
+    def test_fields_listed_once(self):
+        result = to_columnar(SAMPLE_POKEMON, ("number", "name"))
+        assert result["fields"] == ["number", "name"]
+        assert result["columns"][0] == [1, 4, 7, 25, 6]
+        assert result["columns"][1] == ["Bulbasaur", "Charmander", "Squirtle", "Pikachu", "Charizard"]
+    
+    def test_types_dictionary_encoded(self):
+        result = to_columnar(SAMPLE_POKEMON, ("name", "type_one", "type_two"))
+        types = result["types"]
+        assert types == sorted(types)
+        decoded = [types[i] for i in result["columns"][1]]
+        assert decoded == [p["type_one"] for p in SAMPLE_POKEMON]
+        decoded = [types[i] for i in result["columns"][2]]
+        assert decoded == [p["type_two"] for p in SAMPLE_POKEMON]
+    
+    def test_missing_fields_are_null(self):
+        result = to_columnar(SAMPLE_POKEMON)
+        assert result["fields"] == list(POKEMON_FIELDS)
+        attack = result["columns"][POKEMON_FIELDS.index("attack")]
+        assert attack == [None] * len(SAMPLE_POKEMON)
+    
+    def test_empty_list(self):
+        result = to_columnar([])
+        assert result["types"] == []
+        assert all(column == [] for column in result["columns"])
+    
+    def test_encode_json_is_compact(self):
+        assert encode_json({"a": [1, 2]}) == b'{"a":[1,2]}'
+
+
+# =============================================================================
+# Test: Sparse Fieldsets
+# =============================================================================
+
+class TestParseFields:
+    def test_canonical_order(self):
+        args = MultiDict({"fields": "captured, name,number"})
+        assert parse_fields(args) == ("number", "name", "captured")
+    
+    def test_unknown_fields_ignored(self):
+        assert parse_fields(MultiDict({"fields": "name,color"})) == ("name",)
+    
+    def test_missing_or_empty(self):
+        assert parse_fields(MultiDict()) is None
+        assert parse_fields(MultiDict({"fields": "color"})) is None
+
+
+class TestEncodeRecords:
+    def setup_method(self):
+        captured_pokemon.clear()
+    
+    def test_matches_projection(self):
+        fields = ("number", "name", "type_two")
+        result = json.loads(encode_records(SAMPLE_POKEMON, fields, {}))
+        assert result == [{f: p[f] for f in fields} for p in SAMPLE_POKEMON]
+    
+    def test_captured_field(self):
+        set_pokemon_captured(25, "Pikachu", captured=True)
+        result = json.loads(encode_records(SAMPLE_POKEMON, ("name", "captured"), {}))
+        assert [p["captured"] for p in result] == [False, False, False, True, False]
+    
+    def test_only_captured(self):
+        result = json.loads(encode_records(SAMPLE_POKEMON[:1], ("captured",), {}))
+        assert result == [{"captured": False}]
+    
+    def test_fragments_cached_per_field_group(self):
+        cache = {}
+        encode_records(SAMPLE_POKEMON, ("number", "name", "captured"), cache)
+        assert list(cache) == [("number", "name")]
+        assert cache[("number", "name")]["25:Pikachu"] == b'{"number":25,"name":"Pikachu"'
+    
+    def test_cached_fragments_see_new_captures(self):
+        cache = {}
+        encode_records(SAMPLE_POKEMON, ("name", "captured"), cache)
+        set_pokemon_captured(1, "Bulbasaur", captured=True)
+        result = json.loads(encode_records(SAMPLE_POKEMON, ("name", "captured"), cache))
+        assert result[0]["captured"] is True
+    
+    def test_field_group_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(helpers, "MAX_CACHED_FIELD_GROUPS", 1)
+        cache = {}
+        encode_records(SAMPLE_POKEMON, ("name",), cache)
+        result = json.loads(encode_records(SAMPLE_POKEMON, ("number",), cache))
+        assert list(cache) == [("name",)]
+        assert result[0] == {"number": 1}
+    
+    def test_empty_list(self):
+        assert encode_records([], ("name",), {}) == b"[]"